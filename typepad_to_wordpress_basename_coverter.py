@@ -2,15 +2,214 @@
 
 import sys
 import re
+import csv
+import mmap
 import string
-from typing import Dict, List, Tuple, Any
-from collections import defaultdict
+import functools
+import concurrent.futures
+
+# Translation table that deletes all punctuation except hyphens, and a
+# precompiled pattern matching runs of whitespace (built once at import
+# time rather than per title)
+_PUNCT_TABLE = str.maketrans('', '', ''.join(char for char in string.punctuation if char != '-'))
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Flush accumulated output lines to the writer once they reach this many
+# characters, so the rewrite loop makes one writelines call per batch
+# instead of one write call per line
+_FLUSH_SIZE = 1 << 16
+
+# Number of mappings/replacements retained in memory (and shown in the
+# summary printed by main); the full record streams to the CSV files
+_SUMMARY_LIMIT = 5
+
+# Entry prefixes checked on every line of the hot loops, interned once
+# at import (with bytes twins for the binary first pass) along with
+# their lengths for slicing off the prefix
+_TITLE_PREFIX = sys.intern('TITLE: ')
+_TITLE_PREFIX_B = b'TITLE: '
+_TITLE_PREFIX_LEN = len(_TITLE_PREFIX)
+_BASENAME_PREFIX = sys.intern('BASENAME: ')
+_BASENAME_PREFIX_B = b'BASENAME: '
+_BASENAME_PREFIX_LEN = len(_BASENAME_PREFIX)
+_UNIQUE_URL_PREFIX = sys.intern('UNIQUE URL: ')
+
+@functools.lru_cache(maxsize=None)
+def create_new_basename(title):
+    """
+    Create a new basename from a title: lowercase, remove all punctuation
+    except hyphens, and replace whitespace runs with hyphens.
+
+    The conversion is pure, so results are cached; exports with repeated
+    titles (republished posts, series) pay the character work only once.
+    """
+    if not title:
+        return None
+
+    # Lowercase, remove all punctuation except hyphens (a single
+    # C-level translate instead of a per-character Python loop), then
+    # replace whitespace runs with hyphens
+    result = title.lower().translate(_PUNCT_TABLE)
+    return _WHITESPACE_RE.sub('-', result.strip())
+
+def _find_at_line_start(mm, marker, pos):
+    """
+    Find the next occurrence of marker at the start of a line, at or
+    after pos; returns -1 if there is none. Markers almost never occur
+    mid-line, so the validation loop rarely iterates.
+    """
+    i = mm.find(marker, pos)
+    while i > 0 and mm[i - 1] != 0x0A:
+        i = mm.find(marker, i + 1)
+    return i
+
+def _rewrite_line(line, url_prefix, new_base_url, basename_info):
+    """
+    Rewrite all blog post URLs in a single line.
+
+    url_prefix is the fixed '://<host>/blog/' literal. The URL structure
+    is rigid enough that candidates can be located with str.find on that
+    literal and validated with direct slice checks (an http/https scheme
+    before it, yyyy/mm/ after it, then a dot-free path ending in
+    '.html') - a single forward scan with no regex engine and no
+    match-object allocations.
+
+    Returns the (possibly unchanged) line and a list of
+    (title, old_url, new_url) tuples, one per URL rewritten. The line
+    scan is kept self-contained here so callers can drive it in batches.
+    """
+    parts = []
+    replacements = []
+    prefix_len = len(url_prefix)
+    last = 0
+    i = 0
+
+    while True:
+        j = line.find(url_prefix, i)
+        if j < 0:
+            break
+        i = j + prefix_len
+
+        # The scheme must immediately precede the '://'
+        if j >= 5 and line[j - 5:j] == 'https':
+            start = j - 5
+        elif j >= 4 and line[j - 4:j] == 'http':
+            start = j - 4
+        else:
+            continue
+
+        # Expect 'yyyy/mm/' immediately after the prefix
+        year = line[i:i + 4]
+        month = line[i + 5:i + 7]
+        if not (year.isdigit() and month.isdigit()
+                and line[i + 4:i + 5] == '/' and line[i + 7:i + 8] == '/'):
+            continue
+
+        # The path runs to the first dot, which must begin '.html'
+        path_start = i + 8
+        dot = line.find('.', path_start)
+        if dot <= path_start or line[dot:dot + 5] != '.html':
+            continue
+        end = dot + 5
+        old_path = line[path_start:dot]
+
+        # Get the new path and title from our mapping; if no mapping
+        # exists, keep the original URL
+        info = basename_info.get(old_path)
+        if info is None:
+            i = end
+            continue
+        new_path, url_title = info
+
+        # Create the replacement URL (always using https)
+        new_url = f"https://{new_base_url}/{year}/{month}/{new_path}"
+
+        # Store the replacement
+        replacements.append((url_title, line[start:end], new_url))
+
+        # Splice the replacement into the output
+        parts.append(line[last:start])
+        parts.append(new_url)
+        last = end
+        i = end
+
+    if not parts:
+        return line, replacements
+
+    parts.append(line[last:])
+    return ''.join(parts), replacements
+
+def _transform_line(line, url_prefix, new_base_url, basename_info):
+    """
+    Apply the rewrite rules to a single line of the export.
+
+    Returns the (possibly unchanged) output line and a list of
+    (title, old_url, new_url) replacement tuples, or None if the line
+    was not scanned for URLs.
+    """
+    # Dispatch on the first character before running the full
+    # startswith checks; body lines rarely begin with T/B/U, so
+    # most lines skip straight to the URL branch
+    first_char = line[:1]
+
+    # Preserve TITLE lines as-is
+    if first_char == 'T' and line.startswith(_TITLE_PREFIX):
+        return line, None
+
+    # Rewrite BASENAME lines from our mapping; if no mapping exists,
+    # keep the original line
+    if first_char == 'B' and line.startswith(_BASENAME_PREFIX):
+        old_basename = line[_BASENAME_PREFIX_LEN:].strip()
+        info = basename_info.get(old_basename)
+        if info is not None:
+            return f'BASENAME: {info[0]}\n', None
+        return line, None
+
+    # Preserve original UNIQUE URL lines
+    if first_char == 'U' and line.startswith(_UNIQUE_URL_PREFIX):
+        return line, None
+
+    # Lines without the '://<host>/blog/' literal can't contain a URL
+    # to rewrite; one C-level substring scan on the full prefix replaces
+    # separate scheme and host checks, and also rules out lines that
+    # merely mention the host in prose
+    if url_prefix not in line:
+        return line, None
+
+    # Substitute all URLs in a single sweep; for lines with no match,
+    # the original string is returned unchanged
+    return _rewrite_line(line, url_prefix, new_base_url, basename_info)
+
+def _rewrite_chunk(args):
+    """
+    Rewrite one byte range of the input file (worker side of the
+    parallel rewrite pass). The range must start and end on line
+    boundaries. Returns the rewritten text and the replacement tuples
+    recorded for the range, in line order.
+    """
+    input_file, range_start, range_end, url_prefix, new_base_url, basename_info = args
+    out_lines = []
+    replacements = []
+
+    with open(input_file, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm.seek(range_start)
+        while mm.tell() < range_end:
+            line, line_replacements = _transform_line(
+                mm.readline().decode(), url_prefix, new_base_url, basename_info)
+            out_lines.append(line)
+            if line_replacements:
+                replacements.extend(line_replacements)
+        mm.close()
+
+    return ''.join(out_lines), replacements
 
 def process_file(input_file: str, output_file: str, 
                 original_base_url: str = "gumption.typepad.com", 
                 new_base_url: str = "interrelativity.com",
                 basename_mappings_file: str = "basename_mappings.txt",
-                url_replacements_file: str = "url_replacements.txt"):
+                url_replacements_file: str = "url_replacements.txt",
+                workers: int = 1):
     """
     Process an input file to:
     1. Find all TITLE and BASENAME strings
@@ -27,183 +226,181 @@ def process_file(input_file: str, output_file: str,
         new_base_url (str): New base URL to replace with (default: "interrelativity.com")
         basename_mappings_file (str): File to save basename mappings (default: "basename_mappings.txt")
         url_replacements_file (str): File to save URL replacements (default: "url_replacements.txt")
-        
+        workers (int): Number of worker processes for the rewrite pass
+            (default: 1, i.e. rewrite in-process; useful for very large
+            exports once the mapping pass has completed)
+
     Returns:
-        Tuple[List[Dict], List[Dict]]: A tuple containing:
-            - List of dictionaries with title, old_basename, and new_basename
-            - List of dictionaries with title, old_url, and new_url for each URL replacement
+        Tuple[int, List[Tuple], int, List[Tuple]]: A tuple containing:
+            - Total number of basename mappings created
+            - The first few (title, old_basename, new_basename) tuples
+            - Total number of URL replacements made
+            - The first few (title, old_url, new_url) tuples
+
+        The complete record of mappings and replacements is streamed to
+        basename_mappings_file and url_replacements_file; only these
+        counts and summary heads are kept in memory.
     """
-    # Lists to store mappings and replacements
-    basename_mappings = []
-    url_replacements = []
-    
-    # Dictionary to store basename mappings for faster lookup
-    basename_mapping_dict = {}
-    
-    # Dictionary to track title by old_basename
-    title_by_basename = {}
-    
-    # Escape dots and other special characters in the URLs for regex
-    original_base_url_escaped = re.escape(original_base_url)
-    
-    # Pattern to match original URLs
-    url_pattern = re.compile(f'(https?://{original_base_url_escaped}/blog/(\d{{4}})/(\d{{2}})/([^.]+)\.html)')
-    
-    # Function to create new_basename from title
-    def create_new_basename(title):
-        if not title:
-            return None
-        
-        # Convert to lowercase
-        result = title.lower()
-        
-        # Create a custom punctuation set that excludes hyphens
-        custom_punctuation = ''.join(char for char in string.punctuation if char != '-')
-        
-        # Remove all punctuation except hyphens
-        result = ''.join(char for char in result if char not in custom_punctuation)
-        
-        # Replace whitespace with hyphens
-        result = re.sub(r'\s+', '-', result.strip())
-        
-        return result
-    
+    # Counts plus short head buffers for the summary in main
+    basename_mapping_count = 0
+    basename_mapping_head = []
+    url_replacement_count = 0
+    url_replacement_head = []
+
+    # Maps old_basename to its (new_basename, title) pair - one dict
+    # probe per lookup instead of parallel dicts keyed the same way
+    basename_info = {}
+
+    # Fixed literal locating candidate URLs on the original host
+    url_prefix = f'://{original_base_url}/blog/'
+
+    # Map the input file into memory once, so the mapping pass and the
+    # rewrite pass below both read from the same mapping instead of
+    # opening and re-reading the file from disk a second time.
+    # (A true single pass is not possible here: a URL early in the file
+    # may reference the basename of a later entry, so all mappings must
+    # be known before any line can be rewritten.)
     try:
-        # First pass: Collect all title-basename pairs
-        title_basename_pairs = []
-        current_title = None
-        
-        with open(input_file, 'r') as infile:
-            for line in infile:
-                # Check if line starts with 'TITLE: '
-                if line.startswith('TITLE: '):
-                    # Extract the title
-                    current_title = line[len('TITLE: '):].strip()
-                
-                # Check if line starts with 'BASENAME: '
-                elif line.startswith('BASENAME: '):
-                    # Extract the old basename
-                    old_basename = line[len('BASENAME: '):].strip()
-                    
-                    # If we have a title, store the pair
-                    if current_title:
-                        title_basename_pairs.append((current_title, old_basename))
-                        # Reset title to avoid duplicates
-                        current_title = None
-        
-        # Second pass: Create all mappings
-        for title, old_basename in title_basename_pairs:
-            # Create new basename from title
-            new_basename = create_new_basename(title)
-            
-            # Store mappings
-            basename_mapping_dict[old_basename] = new_basename
-            title_by_basename[old_basename] = title
-            
-            # Only add to mappings list if old and new are different
-            if old_basename != new_basename:
-                mapping = {
-                    'title': title,
-                    'old_basename': old_basename,
-                    'new_basename': new_basename
-                }
-                basename_mappings.append(mapping)
-        
-        # Third pass: Apply mappings to the file
-        current_title = None
-        with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-            for line in infile:
-                # Check if line starts with 'TITLE: '
-                if line.startswith('TITLE: '):
-                    current_title = line[len('TITLE: '):].strip()
-                    outfile.write(line)  # Write original line
-                
-                # Check if line starts with 'BASENAME: '
-                elif line.startswith('BASENAME: '):
-                    old_basename = line[len('BASENAME: '):].strip()
-                    
-                    # Get the new basename from our mapping
-                    if old_basename in basename_mapping_dict:
-                        new_basename = basename_mapping_dict[old_basename]
-                        outfile.write(f'BASENAME: {new_basename}\n')
-                    else:
-                        # If no mapping exists, keep the original
-                        outfile.write(line)
-                
-                # Check if line starts with 'UNIQUE URL: '
-                elif line.startswith('UNIQUE URL: '):
-                    outfile.write(line)  # Preserve original UNIQUE URL lines
-                
-                # Process other lines for URL replacements
-                else:
-                    modified_line = line
-                    
-                    # Find all URL matches in the line
-                    matches = list(url_pattern.finditer(line))
-                    
-                    # Process matches in reverse order to avoid offset issues when replacing
-                    for match in reversed(matches):
-                        full_match = match.group(1)
-                        year = match.group(2)
-                        month = match.group(3)
-                        old_path = match.group(4)
-                        
-                        # Get the title for this URL (if available)
-                        url_title = None
-                        if old_path in title_by_basename:
-                            url_title = title_by_basename[old_path]
-                        
-                        # Get the new path from our mapping
-                        if old_path in basename_mapping_dict:
-                            new_path = basename_mapping_dict[old_path]
-                            
-                            # Create the replacement URL (always using https)
-                            new_url = f"https://{new_base_url}/{year}/{month}/{new_path}"
-                            
-                            # Store the replacement
-                            url_replacements.append({
-                                'title': url_title,
-                                'old_url': full_match,
-                                'new_url': new_url
-                            })
-                            
-                            # Replace in the line
-                            modified_line = modified_line.replace(full_match, new_url)
-                    
-                    # Write the modified line
-                    outfile.write(modified_line)
-        
-        # Save basename mappings to file
-        with open(basename_mappings_file, 'w') as f:
-            for mapping in basename_mappings:
-                f.write(f"{mapping['old_basename']},{mapping['new_basename']}\n")
-        
-        # Save URL replacements to file
-        with open(url_replacements_file, 'w') as f:
-            for replacement in url_replacements:
-                title = replacement['title'] or ''
-                # Escape any commas in the title with a backslash
-                title = title.replace(',', '\\,')
-                f.write(f"{title},{replacement['old_url']},{replacement['new_url']}\n")
-        
-        print(f"Successfully processed {input_file} and wrote results to {output_file}")
-        print(f"Created {len(basename_mappings)} basename mappings (saved to {basename_mappings_file})")
-        print(f"Made {len(url_replacements)} URL replacements (saved to {url_replacements_file})")
-        print(f"Replaced URLs from '{original_base_url}' to '{new_base_url}'")
-        
-        return basename_mappings, url_replacements
-    
+        with open(input_file, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
     except FileNotFoundError as e:
         print(f"Error: File not found - {e}")
-        return [], []
-    except Exception as e:
+        return 0, [], 0, []
+    except ValueError as e:
+        # e.g. an empty input file cannot be memory-mapped
         print(f"Error occurred: {e}")
-        return [], []
+        return 0, [], 0, []
+
+    # Open the mapping and replacement files up front so rows stream
+    # to disk as they are produced, instead of accumulating for a
+    # bulk write at the end
+    bm_file = open(basename_mappings_file, 'w', newline='', buffering=1 << 20)
+    bm_writer = csv.writer(bm_file)
+    ur_file = open(url_replacements_file, 'w', newline='', buffering=1 << 20)
+    ur_writer = csv.writer(ur_file)
+
+    # First pass: Create all mappings directly as each TITLE/BASENAME
+    # pair is found. Rather than iterating line by line, jump between
+    # marker occurrences with C-level find calls, decoding only the
+    # TITLE/BASENAME lines themselves (body text is skipped entirely)
+    current_title = None
+    next_title = _find_at_line_start(mm, _TITLE_PREFIX_B, 0)
+    next_basename = _find_at_line_start(mm, _BASENAME_PREFIX_B, 0)
+
+    while next_title >= 0 or next_basename >= 0:
+        # Consume whichever marker comes first, preserving the
+        # line-order pairing of each BASENAME with the TITLE most
+        # recently seen before it
+        if next_basename < 0 or 0 <= next_title < next_basename:
+            # Extract the title
+            start = next_title + _TITLE_PREFIX_LEN
+            end = mm.find(b'\n', start)
+            if end < 0:
+                end = len(mm)
+            current_title = mm[start:end].decode().strip()
+            next_title = _find_at_line_start(mm, _TITLE_PREFIX_B, end)
+
+        else:
+            # Extract the old basename
+            start = next_basename + _BASENAME_PREFIX_LEN
+            end = mm.find(b'\n', start)
+            if end < 0:
+                end = len(mm)
+            old_basename = mm[start:end].decode().strip()
+            next_basename = _find_at_line_start(mm, _BASENAME_PREFIX_B, end)
+
+            # If we have a title, create the mapping
+            if current_title:
+                new_basename = create_new_basename(current_title)
+
+                # Store the mapping
+                basename_info[old_basename] = (new_basename, current_title)
+
+                # Only record the mapping if old and new are different
+                if old_basename != new_basename:
+                    basename_mapping_count += 1
+                    if len(basename_mapping_head) < _SUMMARY_LIMIT:
+                        basename_mapping_head.append(
+                            (current_title, old_basename, new_basename))
+                    bm_writer.writerow((old_basename, new_basename))
+
+                # Reset title to avoid duplicates
+                current_title = None
+    
+    # Record a batch of URL replacements: update the running count,
+    # top up the summary head, and stream the rows to disk
+    def record_replacements(replacements):
+        nonlocal url_replacement_count
+        url_replacement_count += len(replacements)
+        if len(url_replacement_head) < _SUMMARY_LIMIT:
+            url_replacement_head.extend(
+                replacements[:_SUMMARY_LIMIT - len(url_replacement_head)])
+        ur_writer.writerows(
+            (title or '', old_url, new_url)
+            for title, old_url, new_url in replacements)
+
+    # Rewrite pass: Apply mappings, re-reading the file from the memory
+    # map (served from the page cache, no additional read syscalls).
+    # The pass is line-independent once the mappings exist, so with
+    # workers > 1 the file is sharded on line boundaries and rewritten
+    # by a process pool, with results merged back in order
+    if workers > 1:
+        size = len(mm)
+        bounds = [0]
+        for k in range(1, workers):
+            newline_pos = mm.find(b'\n', size * k // workers)
+            bounds.append(newline_pos + 1 if newline_pos >= 0 else size)
+        bounds.append(size)
+        tasks = [(input_file, range_start, range_end,
+                  url_prefix, new_base_url, basename_info)
+                 for range_start, range_end in zip(bounds, bounds[1:])
+                 if range_start < range_end]
+
+        with open(output_file, 'w', buffering=1 << 20) as outfile, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            for text, replacements in pool.map(_rewrite_chunk, tasks):
+                outfile.write(text)
+                if replacements:
+                    record_replacements(replacements)
+    else:
+        mm.seek(0)
+        out_buf = []
+        out_len = 0
+        with open(output_file, 'w', buffering=1 << 20) as outfile:
+            for raw_line in iter(mm.readline, b''):
+                line, replacements = _transform_line(
+                    raw_line.decode(), url_prefix, new_base_url, basename_info)
+                if replacements:
+                    record_replacements(replacements)
+
+                # Batch output and flush in chunks rather than writing
+                # line by line
+                out_buf.append(line)
+                out_len += len(line)
+                if out_len >= _FLUSH_SIZE:
+                    outfile.writelines(out_buf)
+                    out_buf.clear()
+                    out_len = 0
+
+            if out_buf:
+                outfile.writelines(out_buf)
+
+    mm.close()
+    bm_file.close()
+    ur_file.close()
+    
+    print(f"Successfully processed {input_file} and wrote results to {output_file}")
+    print(f"Created {basename_mapping_count} basename mappings (saved to {basename_mappings_file})")
+    print(f"Made {url_replacement_count} URL replacements (saved to {url_replacements_file})")
+    print(f"Replaced URLs from '{original_base_url}' to '{new_base_url}'")
+
+    return (basename_mapping_count, basename_mapping_head,
+            url_replacement_count, url_replacement_head)
 
 def main():
     # Parse command line arguments
-    if len(sys.argv) < 3 or len(sys.argv) > 7:
-        print("Usage: python url_basename_processor.py <input_file> <output_file> [original_base_url] [new_base_url] [basename_mappings_file] [url_replacements_file]")
+    if len(sys.argv) < 3 or len(sys.argv) > 8:
+        print("Usage: python url_basename_processor.py <input_file> <output_file> [original_base_url] [new_base_url] [basename_mappings_file] [url_replacements_file] [workers]")
         sys.exit(1)
     
     input_file = sys.argv[1]
@@ -214,7 +411,8 @@ def main():
     new_base_url = "interrelativity.com"
     basename_mappings_file = "basename_mappings.txt"
     url_replacements_file = "url_replacements.txt"
-    
+    workers = 1
+
     # Override defaults if provided as arguments
     if len(sys.argv) >= 4:
         original_base_url = sys.argv[3]
@@ -224,38 +422,42 @@ def main():
         basename_mappings_file = sys.argv[5]
     if len(sys.argv) >= 7:
         url_replacements_file = sys.argv[6]
-    
+    if len(sys.argv) >= 8:
+        workers = int(sys.argv[7])
+
     # Process the file
-    basename_mappings, url_replacements = process_file(
+    basename_mapping_count, basename_mapping_head, \
+        url_replacement_count, url_replacement_head = process_file(
         input_file, 
         output_file, 
         original_base_url, 
         new_base_url,
         basename_mappings_file,
-        url_replacements_file
+        url_replacements_file,
+        workers
     )
     
     # Print summary of basename mappings
-    if basename_mappings:
+    if basename_mapping_head:
         print("\nBasename Mapping Summary:")
-        for i, mapping in enumerate(basename_mappings[:5], 1):
-            print(f"\n{i:3d}. Title: {mapping['title']}")
-            print(f"     Old Basename: '{mapping['old_basename']}'")
-            print(f"     New Basename: '{mapping['new_basename']}'")
-        
-        if len(basename_mappings) > 5:
-            print(f"\n... and {len(basename_mappings) - 5} more mappings")
-    
+        for i, (title, old_basename, new_basename) in enumerate(basename_mapping_head, 1):
+            print(f"\n{i:3d}. Title: {title}\n"
+                  f"     Old Basename: '{old_basename}'\n"
+                  f"     New Basename: '{new_basename}'")
+
+        if basename_mapping_count > len(basename_mapping_head):
+            print(f"\n... and {basename_mapping_count - len(basename_mapping_head)} more mappings")
+
     # Print summary of URL replacements
-    if url_replacements:
+    if url_replacement_head:
         print("\nURL Replacement Summary:")
-        for i, replacement in enumerate(url_replacements[:5], 1):
-            print(f"\n{i:3d}. Title: {replacement['title'] or '(No title available)'}")
-            print(f"     Old URL: {replacement['old_url']}")
-            print(f"     New URL: {replacement['new_url']}")
-        
-        if len(url_replacements) > 5:
-            print(f"\n... and {len(url_replacements) - 5} more replacements")
+        for i, (title, old_url, new_url) in enumerate(url_replacement_head, 1):
+            print(f"\n{i:3d}. Title: {title or '(No title available)'}\n"
+                  f"     Old URL: {old_url}\n"
+                  f"     New URL: {new_url}")
+
+        if url_replacement_count > len(url_replacement_head):
+            print(f"\n... and {url_replacement_count - len(url_replacement_head)} more replacements")
 
 if __name__ == "__main__":
     main()